@@ -1,11 +1,127 @@
 # app.py
-from flask import Flask, render_template
-import requests
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import Flask, Response, redirect, render_template, jsonify, request, url_for
+from flask.json.provider import DefaultJSONProvider
+
+import assets
+import fonts
+import images
+import legacy
+import precompile
+from breaker import CircuitBreaker
+from cache import TTLCache
+from delta import ReadingLog
+from downsample import lttb, lttb_indices
+from events import ReadingFeed
+from fragments import FragmentCacheExtension
+from history import History
+from pagecache import PageCache
+from poller import Poller
+from readings import NUMERIC_FIELDS, Reading, heat_index, normalize_all, parse_datetime
+from shared import SharedSnapshot
+from singleflight import SingleFlight
+from snapshot import EMPTY
+from store import ReadingStore
+from upstream import NOT_MODIFIED, client
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Serialize Readings as dicts, and datetimes as "YYYY-MM-DD HH:MM:SS" in station time"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Reading):
+            return o.as_dict()
+        if isinstance(o, datetime):
+            return o.isoformat(sep=' ')
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
+app.register_blueprint(legacy.bp)
+# Render missing (None) reading values as a dash instead of "None"
+app.jinja_env.finalize = lambda value: '—' if value is None else value
+# Hashed, precompressed static files once `flask --app app assets` has run
+static_assets = assets.Assets(app)
+# Font Awesome cut down to the icons in use once `flask --app app fonts` has run
+static_fonts = fonts.Fonts(app)
+# picture() for responsive images once `flask --app app images` has run
+static_images = images.Images(app)
+# {% cache %} for the includes that are the same on every render
+app.jinja_env.add_extension(FragmentCacheExtension)
 
 API_URL = "https://apaw.cspc.edu.ph/apawbalatanapi/APIv1/Weather"
 
+# Seconds between background polls of the upstream; 0 disables the poller
+# and falls back to fetching on demand through the TTL cache
+POLL_INTERVAL = int(os.environ.get("APAW_POLL_INTERVAL", 60))
+
+# Seconds a fetched payload is served before a background refresh kicks in
+CACHE_TTL = int(os.environ.get("APAW_CACHE_TTL", 60))
+
+# Consecutive upstream failures before the circuit opens, and how long it
+# stays open before a trial request is let through
+BREAKER_THRESHOLD = int(os.environ.get("APAW_BREAKER_THRESHOLD", 3))
+BREAKER_RESET = int(os.environ.get("APAW_BREAKER_RESET", 120))
+
+# Pages flag their data as stale once the snapshot is older than this
+STALE_AFTER = int(os.environ.get("APAW_STALE_AFTER", 3 * max(POLL_INTERVAL, CACHE_TTL)))
+
+# Where the latest snapshot is kept so restarted workers start warm
+SNAPSHOT_PATH = os.environ.get("APAW_SNAPSHOT_PATH",
+                               os.path.join(app.instance_path, "weather-snapshot.pickle"))
+
+# Days of readings kept in memory per station, beyond the upstream window
+HISTORY_DAYS = int(os.environ.get("APAW_HISTORY_DAYS", 14))
+
+# Local time-series database every ingested reading is kept in
+DB_PATH = os.environ.get("APAW_DB_PATH", os.path.join(app.instance_path, "readings.sqlite3"))
+
+# Compiled templates are kept here so restarted workers skip compiling them
+# (empty to disable)
+TEMPLATE_CACHE = os.environ.get("APAW_TEMPLATE_CACHE",
+                                os.path.join(app.instance_path, "jinja-cache"))
+if TEMPLATE_CACHE:
+    app.jinja_env.bytecode_cache = precompile.bytecode_cache(TEMPLATE_CACHE)
+
+# Readings the home page shows as cards, and plots on its chart
+HOME_ROWS = 6
+CHART_POINTS = 24
+
+# Series ranges longer than these are read from hourly/daily rollups
+# instead of raw readings
+ROLLUP_HOURLY_AFTER = timedelta(days=int(os.environ.get("APAW_ROLLUP_HOURLY_DAYS", 7)))
+ROLLUP_DAILY_AFTER = timedelta(days=int(os.environ.get("APAW_ROLLUP_DAILY_DAYS", 90)))
+
+# Default and maximum number of points the series API returns
+SERIES_POINTS = 500
+SERIES_MAX_POINTS = 5000
+
+# Fields the batch series computes from stored ones: {name: (inputs, function)}
+DERIVED_FIELDS = {'HeatIndex': (('Temperature', 'Humidity'), heat_index)}
+
+# Column names of the old timeseries API, accepted by the batch series
+LEGACY_FIELDS = {'temperature': 'Temperature', 'heatindex': 'HeatIndex',
+                 'windspeed': 'WindSpeed', 'winddirection': 'WindDegree',
+                 'humidity': 'Humidity', 'hourlyrain': 'HourlyRain',
+                 'waterlevel': 'WaterLevel'}
+
+# Live streams one worker serves at once (0 for no limit); gunicorn.conf.py
+# sets it below the thread count when running without gevent
+MAX_STREAMS = int(os.environ.get("APAW_MAX_STREAMS", 0))
+STREAM_RETRY_AFTER = 30
+
+# Default and maximum number of readings one /api/readings page returns
+READINGS_LIMIT = 1000
+READINGS_MAX_LIMIT = 5000
+
 # Site information (maps StationID to actual locations)
 SITES = [
     {'id': 'St1', 'name': 'MDRRMO Office'},
@@ -14,20 +130,120 @@ SITES = [
     {'id': 'St4', 'name': 'Mang-it Station'},
     {'id': 'St5', 'name': 'Cabanbanan Station'},
 ]
+SITES_BY_ID = {s['id']: s for s in SITES}
 
 
-def fetch_weather():
-    try:
-        r = requests.get(API_URL, timeout=8)
-        r.raise_for_status()
-        payload = r.json()
-        # normalize: some APIs return {"data":[...]}, others return [...]
-        if isinstance(payload, dict) and "data" in payload:
-            return payload["data"]
+def _get_weather():
+    payload = client.get_json(API_URL, conditional=True)
+    if payload is NOT_MODIFIED:
         return payload
-    except Exception as e:
-        # log in real apps; here we just return empty
-        return []
+    # normalize: some APIs return {"data":[...]}, others return [...]
+    if isinstance(payload, dict) and "data" in payload:
+        payload = payload["data"]
+    # parse every field once here; nothing downstream converts strings again
+    return normalize_all(payload)
+
+
+# Concurrent misses for the same URL share one in-flight upstream request
+upstream_flight = SingleFlight()
+
+# While the upstream is down, fail fast and keep serving the last snapshot
+upstream_breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+
+
+def _fetch_upstream():
+    # the breaker inside the flight: callers sharing one attempt count once
+    return upstream_flight.do(API_URL, upstream_breaker.call, _get_weather)
+
+
+# One worker per host polls and writes the snapshot file, the rest read it
+shared = SharedSnapshot(SNAPSHOT_PATH)
+
+# Written only by whoever fetched the snapshot; read by every worker
+store = ReadingStore(DB_PATH)
+
+
+def _publish(snapshot):
+    # rows first, so a worker that sees the new version finds its readings
+    try:
+        store.ingest(snapshot)
+    finally:
+        shared.publish(snapshot)
+
+
+def _is_writer():
+    if not shared.is_writer():
+        return False
+    # A new writer continues from the newest shared snapshot, not its own
+    poller.snapshot = shared.read(poller.snapshot)
+    return True
+
+
+def _reload(previous):
+    """TTL cache loader: fetch and persist the snapshot following ``previous``"""
+    previous = previous or EMPTY
+    snapshot = previous.next(_fetch_upstream())
+    if snapshot.version != previous.version:
+        try:
+            snapshot.save(SNAPSHOT_PATH)
+            store.ingest(snapshot)
+        except (OSError, sqlite3.Error):
+            pass
+    return snapshot
+
+
+# Warm start: serve the snapshot the previous process left behind
+_saved = shared.load()
+
+poller = Poller(_fetch_upstream, interval=POLL_INTERVAL, snapshot=_saved,
+                on_publish=_publish, is_writer=_is_writer) if POLL_INTERVAL > 0 else None
+weather_cache = TTLCache(_reload, ttl=CACHE_TTL, initial=_saved)
+
+# Every snapshot this worker sees is folded into its in-memory history
+history = History(days=HISTORY_DAYS)
+
+
+def current_snapshot():
+    """The latest published snapshot; never waits on the upstream when polling"""
+    if poller is not None:
+        poller.start()
+        snapshot = shared.read(poller.snapshot)
+    else:
+        try:
+            snapshot = weather_cache.get()
+        except Exception as e:
+            # log in real apps; here we just return empty
+            snapshot = EMPTY
+    history.merge(snapshot)
+    return snapshot
+
+
+def freshness(snapshot):
+    """Template variables telling visitors how old the shown readings are"""
+    age = snapshot.age
+    return {
+        'updated_at': snapshot.fetched_at,
+        'stale': age is None or age > STALE_AFTER or upstream_breaker.is_open,
+    }
+
+
+def _page_state():
+    """What rendered pages depend on besides the URL: data version and staleness"""
+    snapshot = current_snapshot()
+    fresh = freshness(snapshot)
+    return snapshot.version, fresh['stale'], fresh['updated_at'] if fresh['stale'] else None
+
+
+# Rendered pages are reused until a new snapshot arrives
+page_cache = PageCache(_page_state)
+
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    """Format a time.time() value for display"""
+    if value is None:
+        return '—'
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(value))
 
 
 @app.context_processor
@@ -38,36 +254,310 @@ def inject_data():
     }
 
 
+# snapshot version -> (digest, body) of the home chart data
+_charts = {}
+
+
+def home_chart(snapshot):
+    """(digest, JSON body) of the home page chart for ``snapshot``
+
+    The digest is of the content, not the version, so a chart URL means
+    the same data in every worker and can be cached for good.
+    """
+    chart = _charts.get(snapshot.version)
+    if chart is None:
+        rows = snapshot.readings[:CHART_POINTS]
+        body = app.json.dumps({
+            'labels': [r.SensorTime or r.DateTime for r in rows],
+            'temperatures': [r.Temperature for r in rows],
+        }, separators=(',', ':')).encode()
+        chart = hashlib.sha1(body).hexdigest()[:16], body
+        _charts.clear()
+        _charts[snapshot.version] = chart
+    return chart
+
+
 @app.route('/')
+@page_cache
 def home():
-    weather = fetch_weather()   # list[dict]
+    snapshot = current_snapshot()
+    weather = snapshot.readings   # tuple[dict]
     # You can also pre-pick “latest” here if you want:
     latest = weather[0] if weather else None
-    return render_template("home.html", weather=weather, latest=latest)
+    # only what the page renders; the chart loads its data separately
+    digest, _ = home_chart(snapshot)
+    return render_template("home.html", weather=weather[:HOME_ROWS], latest=latest,
+                           chart_url=url_for('home_chart_data', digest=digest),
+                           **freshness(snapshot))
+
+
+@app.route('/api/chart/<digest>.json')
+def home_chart_data(digest):
+    """Home page chart data; immutable, the URL changes with the content"""
+    current, body = home_chart(current_snapshot())
+    if digest != current:
+        response = redirect(url_for('home_chart_data', digest=current))
+        response.cache_control.no_store = True
+        return response
+    response = Response(body, mimetype='application/json')
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 86400
+    response.cache_control.immutable = True
+    return response
 
 
 @app.route('/sites/<site_id>')
+@page_cache
 def site_detail(site_id):
     """Detailed view for a specific weather station"""
     # Find the site info
-    site = next((s for s in SITES if s['id'] == site_id), None)
+    site = SITES_BY_ID.get(site_id)
     if not site:
         return "Site not found", 404
 
-    # Get all weather data
-    weather = fetch_weather()
-
-    # Filter readings for this specific station
-    site_weather = [r for r in weather if r.get('StationID') == site_id]
+    # Readings for this station come pre-grouped (newest first) per snapshot
+    snapshot = current_snapshot()
+    site_weather = snapshot.by_station.get(site_id, ())
 
     # Get latest reading for this station
-    latest = site_weather[0] if site_weather else None
+    latest = snapshot.latest.get(site_id)
 
     return render_template('sites/site_detail.html',
                            site=site,
                            latest=latest,
                            weather=site_weather[:24],  # Last 24 readings
-                           current_site_id=site_id)  # for active nav
+                           current_site_id=site_id,  # for active nav
+                           **freshness(snapshot))
+
+
+def _api_error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+def _range_args(site_id):
+    """(start, end, points) from the query string, or an error message
+
+    from/to default to the 24 hours up to the station's latest reading.
+    """
+    start = end = None
+    if request.args.get('from'):
+        start = parse_datetime(request.args['from'])
+        if start is None:
+            return None, None, None, 'from is not a valid datetime'
+    if request.args.get('to'):
+        end = parse_datetime(request.args['to'])
+        if end is None:
+            return None, None, None, 'to is not a valid datetime'
+    if start is None:
+        latest = current_snapshot().latest.get(site_id)
+        anchor = end or (latest.DateTime if latest and latest.DateTime else datetime.now())
+        start = anchor - timedelta(hours=24)
+
+    points = request.args.get('points', SERIES_POINTS, type=int)
+    points = max(3, min(points, SERIES_MAX_POINTS))
+    return start, end, points, None
+
+
+def _columns(site_id, fields, start, end):
+    """(period, times, {field: values}) for a series
+
+    Long ranges come from the hourly/daily rollups (period "hour"/"day"),
+    shorter ones from memory when it reaches back far enough, else from
+    raw rows in SQLite (period "raw").
+    """
+    span = (end or datetime.now()) - start
+    for period, after in (('day', ROLLUP_DAILY_AFTER), ('hour', ROLLUP_HOURLY_AFTER)):
+        if span > after:
+            return (period,) + store.rollup_columns(site_id, fields, period, start, end)
+    if history.covers(site_id, start):
+        return ('raw',) + history.columns(site_id, fields, start, end)
+    return ('raw',) + store.columns(site_id, fields, start, end)
+
+
+@app.route('/api/stations/<site_id>/series')
+def station_series(site_id):
+    """One field of one station over a time range, downsampled with LTTB
+
+    Query: field (default Temperature), from/to (datetimes), points (at
+    most this many points come back). Returns [epoch milliseconds, value]
+    pairs in station-local time. Ranges past ROLLUP_HOURLY_AFTER plot
+    hourly (then daily) buckets, see "period".
+    """
+    if site_id not in SITES_BY_ID:
+        return _api_error('Site not found', 404)
+    field = request.args.get('field', 'Temperature')
+    if field not in NUMERIC_FIELDS:
+        return _api_error('field must be one of: ' + ', '.join(NUMERIC_FIELDS))
+    start, end, points, error = _range_args(site_id)
+    if error:
+        return _api_error(error)
+
+    period, times, columns = _columns(site_id, [field], start, end)
+    # drop missing values, LTTB needs real numbers
+    kept = [(t, v) for t, v in zip(times, columns[field]) if v == v]
+    sampled = lttb([t * 1000 for t, _ in kept], [v for _, v in kept], points)
+    return jsonify({
+        'station': site_id,
+        'field': field,
+        'from': start,
+        'to': end,
+        'period': period,
+        'count': len(kept),
+        'data': [[int(t), v] for t, v in sampled],
+    })
+
+
+@app.route('/api/stations/<site_id>/series/batch')
+def station_series_batch(site_id):
+    """Several fields of one station on one shared time axis
+
+    Query: fields (comma separated, default every numeric field), from/to,
+    points. Each field keeps its own LTTB-selected points within an equal
+    share of the budget; the union of those times, at most ``points`` of
+    them, is the shared axis "t" (epoch milliseconds) and every series has
+    one value (or null) per time.
+    Long ranges are read from rollups like the single-field series.
+    HeatIndex is computed from Temperature and Humidity, and the old
+    timeseries column names (temperature, heatindex, ...) are accepted and
+    come back under the name asked for.
+    """
+    if site_id not in SITES_BY_ID:
+        return _api_error('Site not found', 404)
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or list(NUMERIC_FIELDS)
+    names = {f: LEGACY_FIELDS.get(f, f) for f in fields}
+    unknown = [f for f, name in names.items() if name not in NUMERIC_FIELDS
+               and name not in DERIVED_FIELDS]
+    if unknown:
+        return _api_error('fields must be among: '
+                          + ', '.join(list(NUMERIC_FIELDS) + list(DERIVED_FIELDS)))
+    fields = list(dict.fromkeys(fields))
+    start, end, points, error = _range_args(site_id)
+    if error:
+        return _api_error(error)
+
+    stored = []
+    for name in map(names.get, fields):
+        stored.extend(DERIVED_FIELDS[name][0] if name in DERIVED_FIELDS else [name])
+    stored = list(dict.fromkeys(stored))
+    period, times, columns = _columns(site_id, stored, start, end)
+    for name in {names[f] for f in fields} & DERIVED_FIELDS.keys():
+        inputs, compute = DERIVED_FIELDS[name]
+        # NaN in, NaN out: a missing input leaves the derived value missing
+        columns[name] = [compute(*values) for values in zip(*(columns[i] for i in inputs))]
+    columns = {f: columns[names[f]] for f in fields}
+    share = max(3, points // len(fields))
+    keep = set()
+    for field in fields:
+        present = [i for i, v in enumerate(columns[field]) if v == v]
+        chosen = lttb_indices([times[i] for i in present],
+                              [columns[field][i] for i in present], share)
+        keep.update(present[j] for j in chosen)
+    keep = sorted(keep)
+    if len(keep) > points:
+        # fewer than 3 points per field: thin the union evenly, ends kept
+        keep = [keep[round(i * (len(keep) - 1) / (points - 1))] for i in range(points)]
+    series = {}
+    for field in fields:
+        values = columns[field]
+        series[field] = [values[i] if values[i] == values[i] else None for i in keep]
+    return jsonify({
+        'station': site_id,
+        'from': start,
+        'to': end,
+        'period': period,
+        'count': len(times),
+        't': [int(times[i] * 1000) for i in keep],
+        'series': series,
+    })
+
+
+# Readings by store row id; the row id is the /api/readings cursor
+reading_log = ReadingLog(store, size=READINGS_MAX_LIMIT)
+
+
+@app.route('/api/readings')
+def readings_since():
+    """Readings ingested after a cursor, so refreshes only fetch what's new
+
+    Without ?since= returns the current snapshot's readings; with
+    ?since=<cursor> only readings stored after it (at most ?limit= per
+    page, "more" says whether to ask again). Either way "cursor" is what to
+    pass as since next time. Readings have the stored fields only, so both
+    kinds of page have the same shape.
+    """
+    snapshot = current_snapshot()
+    since = request.args.get('since')
+    try:
+        reading_log.sync(snapshot.version)
+        if since is None:
+            return jsonify({'cursor': reading_log.cursor, 'more': False,
+                            'readings': [r.as_dict(extra=False) for r in snapshot.readings]})
+        try:
+            since = int(since)
+        except ValueError:
+            return _api_error('since must be a cursor from a previous response')
+        limit = request.args.get('limit', READINGS_LIMIT, type=int)
+        limit = max(1, min(limit, READINGS_MAX_LIMIT))
+        readings, cursor = reading_log.since(since, limit)
+    except sqlite3.Error:
+        return _api_error('reading store unavailable', 503)
+    return jsonify({'cursor': cursor, 'more': len(readings) == limit,
+                    'readings': [r.as_dict(extra=False) for r in readings]})
+
+
+# Pushes new readings to /api/stream subscribers as snapshots arrive
+feed = ReadingFeed(current_snapshot, max_subscribers=MAX_STREAMS)
+
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: one "reading" event per new or changed reading
+
+    Pass ?station=<id> to only receive one station. Event ids are snapshot
+    versions, so a reconnecting EventSource resumes via Last-Event-ID.
+    """
+    station = request.args.get('station')
+    if station is not None and station not in SITES_BY_ID:
+        return _api_error('Site not found', 404)
+    if not feed.subscribe():
+        # every stream holds a thread (without gevent); keep some for pages
+        response, status = _api_error('too many live streams, retry later', 503)
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response, status
+    feed.start()
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = current_snapshot().version
+    response = Response(feed.stream(after, station), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(feed.unsubscribe)
+    return response
+
+
+@app.route('/api/status')
+def status():
+    """Poller/cache counters, for checking the upstream isn't hit per page view"""
+    return jsonify({
+        'poller': poller.stats() if poller is not None else None,
+        'shared': shared.stats(),
+        'history': history.stats(),
+        'store': store.stats(),
+        'cache': weather_cache.stats(),
+        'breaker': upstream_breaker.stats(),
+        'singleflight': upstream_flight.stats(),
+        'upstream': client.stats(),
+        'legacy': legacy.stats(),
+        'feed': feed.stats(),
+        'readings': reading_log.stats(),
+        'pages': page_cache.stats(),
+        'fragments': app.jinja_env.fragment_cache.stats(),
+        'templates': precompile.summary(template_timings),
+        'assets': static_assets.stats(),
+        'images': static_images.stats(),
+        'fonts': static_fonts.stats(),
+    })
+
+
 @app.route('/about')
 def about():
     """About page"""
@@ -80,5 +570,49 @@ def contact():
     return render_template('contact.html')
 
 
+# Every template is loaded at boot (from the bytecode cache when warm), so
+# the first requests of a new worker don't pay for compiling them
+template_timings = precompile.precompile(app.jinja_env)
+
+
+@app.cli.command('precompile')
+def precompile_command():
+    """Fill the bytecode cache (done on import) and show the load times"""
+    for name, seconds in sorted(template_timings.items()):
+        click.echo('%-40s %s' % (name, 'FAILED' if seconds is None
+                                 else '%.2f ms' % (seconds * 1000)))
+
+
+@app.cli.command('assets')
+def assets_command():
+    """Build hashed, precompressed copies of static/ (restart workers to use them)"""
+    manifest = assets.build(app.static_folder)
+    click.echo('%d files, %d compressed%s' % (
+        len(manifest['files']), sum(map(bool, manifest['encodings'].values())),
+        '' if assets.brotli else ' (gzip only: install brotli for .br)'))
+
+
+@app.cli.command('fonts')
+def fonts_command():
+    """Subset Font Awesome to the icons the templates and app.js use (rerun when they change)"""
+    try:
+        manifest = fonts.build(app.root_path, app.static_folder)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo('%d icons in %d fonts: %s' % (len(manifest['icons']), len(manifest['fonts']),
+                                             ', '.join(manifest['icons'])))
+
+
+@app.cli.command('images')
+def images_command():
+    """Build WebP/AVIF variants of static/media (run before `assets`)"""
+    try:
+        built = images.build(app.static_folder)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    formats = sorted({fmt for entry in built.values() for fmt in entry['variants']})
+    click.echo('%d images, formats: %s' % (len(built), ', '.join(formats) or 'none'))
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
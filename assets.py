@@ -0,0 +1,190 @@
+# assets.py
+# Content-hashed, precompressed copies of static/ and serving them
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:     # gzip only
+    brotli = None
+
+# Built files go to static/<DIST>/, listed in static/<DIST>/manifest.json
+DIST = 'dist'
+
+# Source directories that are not served as assets
+SKIP_DIRS = (DIST, 'sass', 'mail')
+
+# Worth compressing; everything else (images, woff2) already is
+COMPRESS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.eot', '.otf')
+
+# Hashed files never change, so browsers may keep them for a year untouched
+MAX_AGE = 365 * 86400
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_SOURCE_MAP = re.compile(r'(?<=sourceMappingURL=)()([^\s*]+)')
+
+
+def build(static_folder):
+    """Write hashed and compressed copies of every asset; returns the manifest.
+
+    Each file becomes ``<name>.<hash>.<ext>`` under static/dist/ with
+    ``.gz`` (and ``.br`` when the brotli package is installed) variants
+    next to it, when those are smaller. url() references in stylesheets are
+    rewritten to the hashed names first, so they hash what they point at.
+    Files of earlier builds are left in place for pages still referring to
+    them; the manifest is written last.
+    """
+    dist = os.path.join(static_folder, DIST)
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), static_folder)
+            sources.append(path.replace(os.sep, '/'))
+    # stylesheets last, so what they reference (fonts, images, their source
+    # maps) is already hashed
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+
+    files, encodings = {}, {}
+    for source in sources:
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            data = f.read()
+        if source.endswith('.css'):
+            data = _rewrite_css(data, source, files)
+        base, ext = posixpath.splitext(source)
+        hashed = '%s.%s%s' % (base, hashlib.sha1(data).hexdigest()[:10], ext)
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_atomic(target, data)
+        files[source] = hashed
+        if ext.lower() in COMPRESS:
+            encodings[hashed] = _compress(target, data)
+
+    manifest = {'files': files, 'encodings': encodings}
+    write_atomic(os.path.join(dist, 'manifest.json'),
+                 json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def _rewrite_css(data, source, files):
+    folder = posixpath.dirname(source)
+
+    def hashed(match):
+        quote, url = match.groups()
+        if ':' in url or url.startswith(('/', '#')):
+            return match.group(0)
+        path, sep, rest = url.partition('?')
+        if not sep:
+            path, sep, rest = url.partition('#')
+        target = files.get(posixpath.normpath(posixpath.join(folder, path)))
+        if target is None:
+            return match.group(0)
+        url = posixpath.relpath(target, folder) + sep + rest
+        if match.re is _SOURCE_MAP:
+            return url
+        return 'url(%s%s%s)' % (quote, url, quote)
+
+    text = _CSS_URL.sub(hashed, data.decode('utf-8'))
+    return _SOURCE_MAP.sub(hashed, text).encode('utf-8')
+
+
+def _compress(target, data):
+    """Write the compressed variants that are worth it; returns their encodings."""
+    variants = [('gzip', '.gz', lambda: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', lambda: brotli.compress(data, quality=11)))
+    written = []
+    for encoding, suffix, compress in variants:
+        packed = compress()
+        if len(packed) < len(data) * 0.9:
+            write_atomic(target + suffix, packed)
+            written.append(encoding)
+    return written
+
+
+def temp_name(path):
+    """Where to write ``path`` before os.replace(); unique per process."""
+    return '%s.tmp%d' % (path, os.getpid())
+
+
+def write_atomic(path, data):
+    """Write ``data`` (bytes or text) so no reader sees a partly written ``path``."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp = temp_name(path)
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Assets:
+    """Serve static files through the manifest written by build().
+
+    ``url_for('static', filename=...)`` returns the hashed name of any
+    file in the manifest, and hashed files are sent precompressed when the
+    browser accepts it, with ``Cache-Control: immutable``. Without a
+    manifest (no build yet, or in development) static files are served as
+    usual.
+    """
+
+    def __init__(self, app=None):
+        self.files = {}
+        self.encodings = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        self.load()
+        app.url_defaults(self._hashed_url)
+        self._send_static = app.view_functions['static']
+        app.view_functions['static'] = self.send
+        app.extensions['assets'] = self
+
+    def load(self):
+        try:
+            with open(os.path.join(self.folder, DIST, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        self.files = manifest.get('files', {})
+        self.encodings = manifest.get('encodings', {})
+
+    def _hashed_url(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.files.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = '%s/%s' % (DIST, hashed)
+
+    def send(self, filename):
+        hashed = filename[len(DIST) + 1:] if filename.startswith(DIST + '/') else None
+        if hashed is None or not self.files:
+            return self._send_static(filename=filename)
+        mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+        encodings = self.encodings.get(hashed, ())
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in encodings and request.accept_encodings[encoding]:
+                response = send_from_directory(self.folder, filename + suffix,
+                                               mimetype=mimetype, max_age=MAX_AGE)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.folder, filename, mimetype=mimetype,
+                                           max_age=MAX_AGE)
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def stats(self):
+        return {'files': len(self.files), 'compressed': sum(map(bool, self.encodings.values())),
+                'brotli': brotli is not None}
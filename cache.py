@@ -0,0 +1,84 @@
+# cache.py
+import threading
+import time
+
+
+class TTLCache:
+    """Cache the result of ``loader(previous)`` for ``ttl`` seconds.
+
+    The loader gets the value it is replacing (None when cold). Once the
+    value goes stale it is still returned immediately while a background
+    thread reloads it (stale-while-revalidate), so only the very first call
+    blocks on the loader. A failed background reload keeps the previous
+    value; a failed first load raises to the caller.
+
+    An ``initial`` value (e.g. read from disk) is served as already stale,
+    so the first call returns it and triggers a background reload.
+    """
+
+    def __init__(self, loader, ttl=60, initial=None):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = initial
+        self._loaded_at = time.monotonic() - ttl if initial is not None else None
+        self._refreshing = False
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def age(self):
+        """Seconds since the cached value was loaded, or None if empty."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def get(self):
+        with self._lock:
+            age = self.age()
+            if age is None:
+                self.misses += 1
+            elif age < self.ttl:
+                self.hits += 1
+                return self._value
+            else:
+                self.stale_hits += 1
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, daemon=True).start()
+                return self._value
+
+        # Cold cache: load in the caller's thread
+        value = self.loader(None)
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+        return value
+
+    def _refresh(self):
+        try:
+            value = self.loader(self._value)
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+                self._refreshing = False
+            return
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+            self.refreshes += 1
+            self._refreshing = False
+
+    def stats(self):
+        age = self.age()
+        return {
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'age': round(age, 1) if age is not None else None,
+        }
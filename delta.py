@@ -0,0 +1,65 @@
+# delta.py
+import bisect
+import threading
+
+
+class ReadingLog:
+    """Recently ingested readings by store row id, for cursor-based deltas.
+
+    The cursor handed to clients is the SQLite row id of the last reading
+    they received (see ReadingStore.since()); ids are shared by every
+    worker and only ever grow. Each worker keeps the newest ``size`` rows in
+    memory, topped up once per snapshot version, so a client that refreshes
+    regularly is answered without touching the database. Older cursors fall
+    back to SQLite.
+    """
+
+    def __init__(self, store, size=5000):
+        self.store = store
+        self.size = size
+        self.version = None     # snapshot version last synced
+        self.cursor = 0         # newest row id held
+        self.floor = 0          # every row after this id is held
+        self._ids = []
+        self._rows = []
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+
+    def sync(self, version):
+        """Pull rows stored since the last sync, once per snapshot version."""
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is None:
+                # start at the tail; older rows are served from the store
+                self.cursor = self.floor = self.store.last_id()
+            for row_id, reading in self.store.since(self.cursor, self.size):
+                self._ids.append(row_id)
+                self._rows.append(reading)
+                self.cursor = row_id
+            if len(self._ids) > 2 * self.size:
+                self.floor = self._ids[-self.size - 1]
+                del self._ids[:-self.size]
+                del self._rows[:-self.size]
+            self.version = version
+
+    def since(self, cursor, limit):
+        """(readings, next cursor) for up to ``limit`` readings after ``cursor``."""
+        with self._lock:
+            if cursor >= self.floor:
+                i = bisect.bisect_right(self._ids, cursor)
+                ids = self._ids[i:i + limit]
+                self.memory_hits += 1
+                return self._rows[i:i + limit], ids[-1] if ids else cursor
+        rows = self.store.since(cursor, limit)
+        self.store_hits += 1
+        if not rows:
+            return [], cursor
+        return [reading for _, reading in rows], rows[-1][0]
+
+    def stats(self):
+        return {'version': self.version, 'cursor': self.cursor, 'held': len(self._ids),
+                'memory_hits': self.memory_hits, 'store_hits': self.store_hits}
@@ -0,0 +1,128 @@
+# events.py
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class ReadingFeed:
+    """Fan new and changed readings out to Server-Sent Events subscribers.
+
+    One watcher thread per worker checks the current snapshot every
+    ``interval`` seconds (a memory read, see shared.py) and, when its
+    version changes, records the readings that are new or differ from the
+    previous snapshot and wakes every waiting subscriber. Subscribers only
+    block on a Condition, so an idle connection costs no CPU.
+    """
+
+    def __init__(self, get_snapshot, interval=1.0, backlog=50, max_subscribers=0):
+        self.get_snapshot = get_snapshot
+        self.interval = interval
+        self.max_subscribers = max_subscribers    # 0 for no limit
+        self.version = None
+        self.events = deque(maxlen=backlog)     # (snapshot version, readings)
+        self.subscribers = 0
+        self.rejected = 0
+        self._previous = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start the watcher thread once per process (no-op if running)."""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._cond:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='apaw-feed', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                pass
+
+    def check(self):
+        """Record the changes in the current snapshot, if it is a new one."""
+        snapshot = self.get_snapshot()
+        if snapshot.version == self.version:
+            return
+        current = {(r.StationID, r.DateTime): r for r in snapshot.readings}
+        changed = [r for key, r in current.items() if self._previous.get(key) != r]
+        with self._cond:
+            first = self.version is None
+            self.version = snapshot.version
+            self._previous = current
+            if not first and changed:
+                changed.sort(key=lambda r: (r.DateTime is None, r.DateTime))
+                self.events.append((snapshot.version, changed))
+                self._cond.notify_all()
+
+    def wait(self, after, timeout):
+        """Readings from snapshot versions newer than ``after``.
+
+        Blocks up to ``timeout`` seconds for one to arrive. Returns the new
+        cursor (a snapshot version, the same in every worker) and the
+        readings, oldest first.
+        """
+        with self._cond:
+            if not self._newer(after):
+                self._cond.wait(timeout)
+            readings = []
+            cursor = after
+            for version, rows in self._newer(after):
+                readings.extend(rows)
+                cursor = version
+            return cursor, readings
+
+    def _newer(self, after):
+        return [event for event in self.events if event[0] > after]
+
+    def subscribe(self):
+        """Take a subscriber slot; False when max_subscribers are connected.
+
+        Every successful call must be paired with unsubscribe() once the
+        stream's response is closed.
+        """
+        with self._cond:
+            if self.max_subscribers and self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def stream(self, after, station=None, heartbeat=15):
+        """Generator of SSE messages for one subscriber."""
+        yield 'retry: 5000\n\n'
+        while True:
+            after, readings = self.wait(after, heartbeat)
+            if station is not None:
+                readings = [r for r in readings if r.StationID == station]
+            if not readings:
+                yield ': keepalive\n\n'
+                continue
+            for r in readings:
+                yield 'id: %s\nevent: reading\ndata: %s\n\n' % (after, _dumps(r))
+
+    def stats(self):
+        return {'version': self.version, 'subscribers': self.subscribers,
+                'max_subscribers': self.max_subscribers, 'rejected': self.rejected,
+                'buffered': len(self.events)}
+
+
+def _dumps(reading):
+    values = reading.as_dict()
+    for key in ('DateTime', 'SensorTime'):
+        if values.get(key) is not None:
+            values[key] = values[key].isoformat(sep=' ')
+    return json.dumps(values, separators=(',', ':'))
@@ -0,0 +1,197 @@
+# fonts.py
+# Font Awesome trimmed down to the icons the templates use
+import json
+import os
+import re
+
+from assets import temp_name, write_atomic
+
+try:
+    from fontTools import subset
+except ImportError:     # no subset; pages keep the full vendor stylesheet
+    subset = None
+
+# Full stylesheet and fonts, as shipped
+SOURCE_CSS = 'css/vendor/fontawsome.css'
+SOURCE_FONTS = 'css/webfonts'
+
+# Subset stylesheet, fonts and manifest are written here
+SUBSET = 'css/subset'
+
+# Where icon classes are looked for, relative to the app root
+SCAN = ('templates', 'static/js/app.js')
+
+# Other stylesheets that draw icons with content: "\f148" and the Pro font
+EXTRA_CSS = ('css/app.css',)
+
+# Style classes and the font file (in SOURCE_FONTS) each one draws with
+STYLES = {
+    'fa': 'fa-solid-900', 'fa-classic': 'fa-solid-900', 'fa-solid': 'fa-solid-900',
+    'fas': 'fa-solid-900',
+    'fa-regular': 'fa-regular-400', 'far': 'fa-regular-400',
+    'fa-light': 'fa-light-300', 'fal': 'fa-light-300',
+    'fa-thin': 'fa-thin-100', 'fat': 'fa-thin-100',
+    'fa-duotone': 'fa-duotone-900', 'fad': 'fa-duotone-900',
+    'fa-brands': 'fa-brands-400', 'fab': 'fa-brands-400',
+    'fa-sharp': 'fa-sharp-solid-900', 'fa-sharp-solid': 'fa-sharp-solid-900',
+    'fass': 'fa-sharp-solid-900',
+    'fasr': 'fa-sharp-regular-400', 'fasl': 'fa-sharp-light-300', 'fast': 'fa-sharp-thin-100',
+}
+
+_CLASS = re.compile(r'(?<![\w-])(fa[a-z]{0,2}|fa-[a-z0-9-]+)(?![\w-])')
+_SELECTOR_CLASS = re.compile(r'\.(fa[a-z0-9-]*)')
+_ICON_RULE = re.compile(r'^[^{@]*:(?:before|after)\{content:"[^"]*"\}$')
+_CODEPOINT = re.compile(r'\\([0-9a-fA-F]{4,6})')
+_ESCAPE = re.compile(r'\\([0-9a-fA-F]{1,6}) ?|\\(.)|(.)')
+_FONT_URL = re.compile(r'url\(\.\./webfonts/([\w-]+)\.\w+\)')
+
+
+def scan(root):
+    """Font Awesome class names used in the files listed in SCAN."""
+    classes = set()
+    for entry in SCAN:
+        path = os.path.join(root, entry)
+        paths = [path] if os.path.isfile(path) else [
+            os.path.join(folder, name) for folder, _, names in os.walk(path) for name in names
+            if name.endswith('.html')]
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                classes.update(_CLASS.findall(f.read()))
+    return classes
+
+
+def build(root, static_folder):
+    """Write a stylesheet and WOFF2 fonts holding only the icons in use.
+
+    Icon rules are kept for the icons found by scan() and @font-face rules
+    for the styles found (one subset font per style: fa-light, fa-regular,
+    ...). Everything else in the vendor stylesheet (sizing, animations) is
+    kept as is. Returns the manifest.
+    """
+    if subset is None:
+        raise RuntimeError('subsetting fonts needs fontTools and brotli '
+                           '(pip install fonttools brotli)')
+    used = scan(root)
+    styles = {STYLES[c] for c in used if c in STYLES}
+    with open(os.path.join(static_folder, SOURCE_CSS), encoding='utf-8') as f:
+        css = f.read()
+
+    kept, codepoints, icons = [], set(), set()
+    for statement in _statements(css):
+        if statement.startswith('@font-face'):
+            fonts = set(_FONT_URL.findall(statement))
+            if fonts & styles:
+                kept.append(_subset_src(statement, fonts & styles))
+        elif _ICON_RULE.match(statement):
+            selectors, body = statement.split('{', 1)
+            selectors = [s for s in selectors.split(',') if _wanted(s, used)]
+            if selectors:
+                kept.append(','.join(selectors) + '{' + body)
+                codepoints.update(_content(body))
+                icons.update(c for s in selectors for c in _SELECTOR_CLASS.findall(s)
+                             if c not in STYLES)
+        else:
+            kept.append(statement)
+    for name in EXTRA_CSS:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            codepoints.update(cp for cp in (int(c, 16) for c in _CODEPOINT.findall(f.read()))
+                              if 0xe000 <= cp <= 0xf8ff)
+
+    out = os.path.join(static_folder, SUBSET)
+    os.makedirs(os.path.join(out, 'webfonts'), exist_ok=True)
+    fonts = []
+    for style in sorted(styles):
+        target = '%s/webfonts/%s.woff2' % (SUBSET, style)
+        _subset_font(os.path.join(static_folder, SOURCE_FONTS, style + '.ttf'),
+                     os.path.join(static_folder, target), codepoints)
+        fonts.append(target)
+    stylesheet = '%s/fontawsome.css' % SUBSET
+    write_atomic(os.path.join(static_folder, stylesheet), ''.join(kept))
+
+    manifest = {'css': stylesheet, 'fonts': fonts, 'icons': sorted(icons),
+                'codepoints': len(codepoints)}
+    write_atomic(os.path.join(out, 'manifest.json'), json.dumps(manifest, indent=1))
+    return manifest
+
+
+def _statements(css):
+    """Top-level CSS statements (rules, @-blocks and comments), in order."""
+    statements, depth, start, i = [], 0, 0, 0
+    while i < len(css):
+        if css.startswith('/*', i):
+            i = css.index('*/', i) + 2
+            if depth == 0:
+                statements.append(css[start:i])
+                start = i
+            continue
+        char = css[i]
+        if char == '"' or char == "'":
+            i += 1
+            while css[i] != char:
+                i += 2 if css[i] == '\\' else 1
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                statements.append(css[start:i + 1].strip())
+                start = i + 1
+        elif char == ';' and depth == 0:
+            statements.append(css[start:i + 1].strip())
+            start = i + 1
+        i += 1
+    return [s for s in statements if s]
+
+
+def _content(body):
+    """Codepoints of a ``{content:"..."}`` body; "\\f0c9" and "\\+" are escapes."""
+    text = body[body.index('"') + 1:body.rindex('"')]
+    return {int(hex_, 16) if hex_ else ord(char or plain)
+            for hex_, char, plain in _ESCAPE.findall(text)}
+
+
+def _wanted(selector, used):
+    """True if every Font Awesome class in ``selector`` is in use."""
+    return all(c in used for c in _SELECTOR_CLASS.findall(selector))
+
+
+def _subset_src(statement, fonts):
+    style = sorted(fonts)[0]
+    src = 'src:url(webfonts/%s.woff2) format("woff2")' % style
+    return re.sub(r'src:[^;}]*', src, statement, count=1)
+
+
+def _subset_font(source, target, codepoints):
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, temp_name(target), options)
+    os.replace(temp_name(target), target)
+
+
+class Fonts:
+    """The ``font_subset`` template global: the manifest build() wrote, or None."""
+
+    def __init__(self, app=None):
+        self.manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        try:
+            with open(os.path.join(app.static_folder, SUBSET, 'manifest.json')) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = None
+        app.add_template_global(self.manifest, 'font_subset')
+        app.extensions['fonts'] = self
+
+    def stats(self):
+        if self.manifest is None:
+            return {'subset': False, 'fontTools': subset is not None}
+        return {'subset': True, 'icons': len(self.manifest['icons']),
+                'fonts': self.manifest['fonts']}
@@ -0,0 +1,73 @@
+# fragments.py
+import threading
+
+from flask import has_request_context, request
+from jinja2 import nodes
+from jinja2.ext import Extension
+from jinja2.runtime import Undefined
+
+
+class FragmentCache:
+    """Rendered template fragments by key, at most ``size`` of them."""
+
+    def __init__(self, size=512):
+        self.size = size
+        self._fragments = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+        fragment = render()
+        with self._lock:
+            self.misses += 1
+            if len(self._fragments) >= self.size:
+                self._fragments.clear()
+            self._fragments[key] = fragment
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self):
+        return {'fragments': len(self._fragments), 'hits': self.hits, 'misses': self.misses}
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', input, ... %}...{% endcache %}``
+
+    Renders the body once per distinct name and inputs and reuses the
+    output afterwards, for includes that don't depend on the readings
+    (header, sidebar, footer). List everything the body reads from the
+    context as inputs; undefined ones count as None. The request's script
+    root is always part of the key, since url_for() output depends on it.
+    Nothing is cached while templates auto-reload.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.List(key)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if self.environment.auto_reload:
+            return caller()
+        key = tuple(None if isinstance(k, Undefined) else k for k in key)
+        if has_request_context():
+            key += (request.script_root,)
+        return self.environment.fragment_cache.get(key, caller)
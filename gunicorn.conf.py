@@ -0,0 +1,21 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn wsgi:app` when run from this directory.
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 3))
+bind = os.environ.get("APAW_BIND", "127.0.0.1:8000")
+
+# /api/stream keeps one connection open per browser tab. gevent (see
+# requirements.txt) serves thousands of idle streams per worker; without it,
+# fall back to threads so a stream at least doesn't take a whole sync worker.
+try:
+    import gevent  # noqa: F401
+except ImportError:
+    worker_class = "gthread"
+    threads = int(os.environ.get("APAW_THREADS", 32))
+    # Streams past this get a 503 with Retry-After, leaving the other
+    # threads for page requests (read by app.py in every worker)
+    os.environ.setdefault("APAW_MAX_STREAMS", str(threads // 2))
+else:
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("APAW_WORKER_CONNECTIONS", 1000))
@@ -0,0 +1,121 @@
+# history.py
+import bisect
+import threading
+from array import array
+
+from readings import NUMERIC_FIELDS, to_seconds
+
+NAN = float('nan')
+
+
+class StationHistory:
+    """Readings for one station as parallel column arrays, oldest first.
+
+    Times and every numeric field are ``array('d')`` columns (8 bytes per
+    value, NaN for missing) instead of one dict per reading, so weeks of
+    history for every station fit in a few megabytes.
+    """
+
+    def __init__(self, station):
+        self.station = station
+        self.times = array('d')             # DateTime, see readings.to_seconds
+        self.columns = {name: array('d') for name in NUMERIC_FIELDS}
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, reading):
+        """Insert a reading in time order; False if that time is already held."""
+        if reading.DateTime is None:
+            return False
+        t = to_seconds(reading.DateTime)
+        i = bisect.bisect_left(self.times, t)
+        if i < len(self.times) and self.times[i] == t:
+            return False
+        self.times.insert(i, t)
+        for name, column in self.columns.items():
+            value = reading[name]
+            column.insert(i, NAN if value is None else value)
+        return True
+
+    def bounds(self, start=None, end=None):
+        """Index range [lo, hi) of readings with start <= DateTime <= end."""
+        lo = 0 if start is None else bisect.bisect_left(self.times, to_seconds(start))
+        hi = len(self.times) if end is None else bisect.bisect_right(self.times, to_seconds(end))
+        return lo, hi
+
+    def trim(self, before):
+        """Drop readings older than ``before`` (seconds); returns how many."""
+        k = bisect.bisect_left(self.times, before)
+        if k:
+            del self.times[:k]
+            for column in self.columns.values():
+                del column[:k]
+        return k
+
+    @property
+    def nbytes(self):
+        arrays = [self.times, *self.columns.values()]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+class History:
+    """In-memory history for every station, accumulated across snapshots.
+
+    Each new snapshot version is merged in (readings already held are
+    skipped) and anything older than ``days`` before the newest reading is
+    dropped. Reads copy slices under the lock, so callers never see a
+    column mid-update.
+    """
+
+    def __init__(self, days=14):
+        self.retention = days * 86400
+        self.stations = {}
+        self.version = 0    # last snapshot version merged
+        self._lock = threading.Lock()
+
+    def merge(self, snapshot):
+        """Add the readings of ``snapshot``; returns how many were new."""
+        if snapshot.version == self.version:
+            return 0
+        with self._lock:
+            if snapshot.version == self.version:
+                return 0
+            added = 0
+            for station, rows in snapshot.by_station.items():
+                if station is None:
+                    continue
+                history = self.stations.get(station)
+                if history is None:
+                    history = self.stations[station] = StationHistory(station)
+                # rows are newest first; oldest first makes every add an append
+                for reading in reversed(rows):
+                    added += history.add(reading)
+                if history.times:
+                    history.trim(history.times[-1] - self.retention)
+            self.version = snapshot.version
+            return added
+
+    def covers(self, station, start):
+        """True if readings from ``start`` onward are held in memory."""
+        with self._lock:
+            history = self.stations.get(station)
+            return bool(history and history.times and history.times[0] <= to_seconds(start))
+
+    def columns(self, station, fields, start=None, end=None):
+        """(times, {field: values}) column copies between start and end."""
+        with self._lock:
+            history = self.stations.get(station)
+            if history is None:
+                return array('d'), {field: array('d') for field in fields}
+            lo, hi = history.bounds(start, end)
+            return history.times[lo:hi], {field: history.columns[field][lo:hi] for field in fields}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'rows': sum(len(h) for h in self.stations.values()),
+                'bytes': sum(h.nbytes for h in self.stations.values()),
+                'retention_days': self.retention / 86400,
+            }
@@ -0,0 +1,149 @@
+# images.py
+# Resized WebP/AVIF variants of static/media and <picture> markup for them
+import json
+import os
+import posixpath
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+from assets import temp_name, write_atomic
+
+try:
+    from PIL import Image
+except ImportError:     # no variants; picture() falls back to a plain <img>
+    Image = None
+
+# Variants go to static/<VARIANTS>/, listed in static/<VARIANTS>/manifest.json
+VARIANTS = 'media/variants'
+
+# Widths generated for every image, up to its own width (and at most the last)
+WIDTHS = (64, 128, 320, 640, 960, 1280, 1920)
+
+# Preferred first; a format this Pillow can't write is skipped
+FORMATS = (('avif', 'image/avif', {'quality': 50}),
+           ('webp', 'image/webp', {'quality': 80, 'method': 6}))
+
+SOURCES = ('.jpg', '.jpeg', '.png')
+
+
+def build(static_folder):
+    """Write resized variants of every image under static/media/.
+
+    Returns the manifest: for each source, its size and mtime and the
+    variant files per format and width. A source whose mtime matches the
+    previous manifest is skipped, so rebuilds only redo changed images.
+    """
+    if Image is None:
+        raise RuntimeError('building image variants needs Pillow (pip install Pillow)')
+    out = os.path.join(static_folder, VARIANTS)
+    manifest = _load(out)
+    images = {}
+    for root, dirs, files in os.walk(os.path.join(static_folder, 'media')):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out]
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() not in SOURCES:
+                continue
+            path = os.path.join(root, name)
+            source = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            mtime = os.path.getmtime(path)
+            entry = manifest.get(source)
+            if (entry is None or entry['mtime'] != mtime
+                    or not _exists(static_folder, entry, _base(source))):
+                entry = _variants(path, source, static_folder, mtime)
+            images[source] = entry
+    os.makedirs(out, exist_ok=True)
+    write_atomic(os.path.join(out, 'manifest.json'), json.dumps(images, indent=1, sort_keys=True))
+    return images
+
+
+def _variants(path, source, static_folder, mtime):
+    with Image.open(path) as image:
+        image.load()
+        width, height = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        widths = [w for w in WIDTHS if w < width] + ([width] if width <= WIDTHS[-1] else [])
+        base = _base(source)
+        formats = {}
+        for fmt, _, options in FORMATS:
+            written = []
+            for w in widths:
+                target = '%s-%d.%s' % (base, w, fmt)
+                resized = image if w == width else image.resize(
+                    (w, max(1, round(height * w / width))), Image.LANCZOS)
+                full = os.path.join(static_folder, target)
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                try:
+                    resized.save(temp_name(full), format=fmt.upper(), **options)
+                except (KeyError, OSError, ValueError):
+                    # this Pillow build can't encode the format
+                    break
+                os.replace(temp_name(full), full)
+                written.append([w, target])
+            else:
+                formats[fmt] = written
+    return {'mtime': mtime, 'width': width, 'height': height, 'variants': formats}
+
+
+def _base(source):
+    """Variant name prefix; keeps the extension so x.jpg and x.png don't collide."""
+    return posixpath.join(VARIANTS, posixpath.relpath(source, 'media'))
+
+
+def _exists(static_folder, entry, base):
+    return all(target.startswith(base + '-')
+               and os.path.exists(os.path.join(static_folder, target))
+               for variants in entry['variants'].values() for _, target in variants)
+
+
+def _load(folder):
+    try:
+        with open(os.path.join(folder, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class Images:
+    """The ``picture()`` template global, backed by the manifest build() wrote."""
+
+    def __init__(self, app=None):
+        self.images = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.images = _load(os.path.join(app.static_folder, VARIANTS))
+        app.add_template_global(self.picture)
+        app.extensions['images'] = self
+
+    def picture(self, filename, alt='', sizes='100vw', **attrs):
+        """``<picture>`` with AVIF/WebP srcsets for a static image.
+
+        ``sizes`` is how wide the image is displayed (as in the HTML
+        attribute), so the browser can pick the smallest variant that
+        fits. Other keyword arguments become <img> attributes (``class_``
+        for class). Images without variants get a plain <img>.
+        """
+        entry = self.images.get(filename)
+        img = {'src': url_for('static', filename=filename), 'alt': alt}
+        if entry is not None:
+            img['width'], img['height'] = entry['width'], entry['height']
+        img.update((key.rstrip('_'), value) for key, value in attrs.items())
+        tag = '<img %s />' % ' '.join('%s="%s"' % (key, escape(value))
+                                     for key, value in img.items() if value is not None)
+        if entry is None:
+            return Markup(tag)
+        sources = []
+        for fmt, mimetype, _ in FORMATS:
+            variants = entry['variants'].get(fmt)
+            if variants:
+                srcset = ', '.join('%s %dw' % (url_for('static', filename=target), w)
+                                   for w, target in variants)
+                sources.append('<source type="%s" srcset="%s" sizes="%s" />'
+                               % (mimetype, escape(srcset), escape(sizes)))
+        return Markup('<picture>%s%s</picture>' % (''.join(sources), tag))
+
+    def stats(self):
+        return {'images': len(self.images), 'pillow': Image is not None}
@@ -0,0 +1,92 @@
+# legacy.py
+# Endpoints the old APAW dashboards (old-apaw/) call, served from cache
+import json
+import os
+from operator import itemgetter
+
+from flask import Blueprint, Response, jsonify, request
+
+from breaker import CircuitBreaker
+from cache import TTLCache
+from singleflight import SingleFlight
+from upstream import client
+
+LEGACY_API_URL = "https://apaw.cspc.edu.ph/API/timeseries"
+
+# Columns the legacy timeseries API serves; anything else is rejected
+# before it gets near the upstream URL
+COLUMNS = ('temperature', 'heatindex', 'windspeed', 'humidity', 'hourlyrain',
+           'winddirection', 'waterlevel')
+
+LEGACY_TTL = int(os.environ.get("APAW_LEGACY_TTL", 60))
+
+bp = Blueprint('legacy', __name__)
+
+_flight = SingleFlight()
+_breaker = CircuitBreaker()
+_x = itemgetter('sensordataDateTime')
+
+
+def reshape(rows, col):
+    """Legacy chart points ``[{"x": time, "y": value}]`` from upstream rows.
+
+    Works column-wise: both columns are pulled out with C-level map() calls
+    and zipped back together, instead of popping keys out of every dict.
+    """
+    xs = map(_x, rows)
+    ys = map(itemgetter(col), rows)
+    return [{'x': x, 'y': y} for x, y in zip(xs, ys)]
+
+
+def _fetch(col):
+    data = client.get_json(LEGACY_API_URL, params={'data': col})
+    rows = data['data']['sensor_data'] or []
+    data['data']['sensor_data'] = reshape(rows, col)
+    # serialize once per refresh; requests just send these bytes
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def _loader(col):
+    return lambda previous: _flight.do(col, _breaker.call, _fetch, col)
+
+
+_caches = {col: TTLCache(_loader(col), ttl=LEGACY_TTL) for col in COLUMNS}
+
+
+@bp.route('/timeseries/data')
+def timeseries_data():
+    """Drop-in for old-apaw's /timeseries/data?col=<column>"""
+    col = request.args.get('col')
+    if col not in _caches:
+        return jsonify({'error': 'col must be one of: ' + ', '.join(COLUMNS)}), 400
+    try:
+        body = _caches[col].get()
+    except Exception:
+        return jsonify({'error': 'timeseries service unavailable'}), 503
+    return Response(body, mimetype='application/json')
+
+
+@bp.route('/timeseries/batch')
+def timeseries_batch():
+    """Several columns at once: /timeseries/batch?cols=<column>,<column>
+
+    Returns {"data": {column: <what /timeseries/data returns for it>}},
+    pasted together from the cached bytes of each column.
+    """
+    cols = list(dict.fromkeys(c for c in request.args.get('cols', '').split(',') if c))
+    if not cols or any(col not in _caches for col in cols):
+        return jsonify({'error': 'cols must be among: ' + ', '.join(COLUMNS)}), 400
+    try:
+        bodies = [_caches[col].get() for col in cols]
+    except Exception:
+        return jsonify({'error': 'timeseries service unavailable'}), 503
+    body = b','.join(b'"%s":%s' % (col.encode(), body) for col, body in zip(cols, bodies))
+    return Response(b'{"data":{%s}}' % body, mimetype='application/json')
+
+
+def stats():
+    return {
+        'breaker': _breaker.stats(),
+        'singleflight': _flight.stats(),
+        'caches': {col: cache.stats() for col, cache in _caches.items()},
+    }
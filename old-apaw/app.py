@@ -2,7 +2,40 @@ from flask import Flask, render_template, jsonify, request, redirect, url_for
 import numpy as np
 import pandas as pd
 import sys, os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One keep-alive session per process; retries connection errors and
+# 502/503/504, never a read timeout
+retry = Retry(total=2, connect=2, read=0, status=2, backoff_factor=0.3,
+              status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+              raise_on_status=False)
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_maxsize=10, max_retries=retry))
+TIMEOUT = (3.05, 8)
+
+# Columns the timeseries API serves; each is fetched at most once a minute
+COLUMNS = ('temperature', 'heatindex', 'windspeed', 'humidity', 'hourlyrain',
+           'winddirection', 'waterlevel')
+CACHE_TTL = 60
+cache = {}
+pool = ThreadPoolExecutor(max_workers=len(COLUMNS))
+
+
+def fetch_column(col):
+    hit = cache.get(col)
+    if hit and time.monotonic() - hit[0] < CACHE_TTL:
+        return hit[1]
+    r = session.get("https://apaw.cspc.edu.ph/API/timeseries", params={'data': col}, timeout=TIMEOUT)
+    data = r.json()
+    for d in data['data']['sensor_data'] or []:
+        d["x"] = d.pop("sensordataDateTime", None)
+        d["y"] = d.pop(col, None)
+    cache[col] = (time.monotonic(), data)
+    return data
 
 app = Flask(__name__)
 app.debug = True
@@ -22,24 +55,36 @@ def about():
 
 @app.route('/currentdata')
 def current():
-    r = requests.get("https://apaw.cspc.edu.ph/API/sensordata?date=latest")
+    r = session.get("https://apaw.cspc.edu.ph/API/sensordata", params={'date': 'latest'}, timeout=TIMEOUT)
     data = r.json()
     return data
 
 @app.route('/timeseries/data')
 def timeseriesdata():
     col = request.args.get('col')
-    r = requests.get("https://apaw.cspc.edu.ph/API/timeseries?data="+ col)
-    data = r.json()
-    for d in data['data']['sensor_data']:
-        d["x"] = d.pop("sensordataDateTime")
-        d["y"] = d.pop(col)
-    return data
+    if col not in COLUMNS:
+        return jsonify({'error': 'col must be one of: ' + ', '.join(COLUMNS)}), 400
+    try:
+        return fetch_column(col)
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return jsonify({'error': 'timeseries service unavailable'}), 503
+
+@app.route('/timeseries/batch')
+def timeseriesbatch():
+    cols = list(dict.fromkeys(c for c in request.args.get('cols', '').split(',') if c))
+    if not cols or any(col not in COLUMNS for col in cols):
+        return jsonify({'error': 'cols must be among: ' + ', '.join(COLUMNS)}), 400
+    try:
+        # concurrently, so a refresh waits for the slowest column, not the sum
+        data = dict(zip(cols, pool.map(fetch_column, cols)))
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return jsonify({'error': 'timeseries service unavailable'}), 503
+    return {'data': data}
 
 
 @app.route('/temporary')
 def temporary():
-    r = requests.get("https://apaw.cspc.edu.ph/API/transmission?data=temporary")
+    r = session.get("https://apaw.cspc.edu.ph/API/transmission", params={'data': 'temporary'}, timeout=TIMEOUT)
     data = r.json()
     return data
 
@@ -0,0 +1,73 @@
+# pagecache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+
+
+class PageCache:
+    """Rendered pages, kept until the data they were rendered from changes.
+
+    Used as a view decorator. Pages are keyed by (endpoint, view args,
+    ``state()``), where ``state`` returns something hashable that changes
+    whenever the page would render differently (the snapshot version, in
+    app.py), so a hit is a dict lookup instead of a template render. Every
+    page gets a strong ETag from its body and conditional requests are
+    answered with 304. Only 200 responses are kept, at most ``size`` of
+    them, least recently used dropped first. Caching is off while templates
+    auto-reload (debug mode).
+    """
+
+    def __init__(self, state, size=256):
+        self.state = state
+        self.size = size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def __call__(self, view):
+        @wraps(view)
+        def cached_view(**kwargs):
+            if current_app.jinja_env.auto_reload:
+                # templates are being edited; always render
+                return view(**kwargs)
+            key = (request.endpoint, tuple(sorted(kwargs.items())), self.state())
+            with self._lock:
+                page = self._pages.get(key)
+                if page is not None:
+                    self._pages.move_to_end(key)
+                    self.hits += 1
+            if page is None:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                page = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+                with self._lock:
+                    self.misses += 1
+                    self._pages[key] = page
+                    while len(self._pages) > self.size:
+                        self._pages.popitem(last=False)
+
+            body, mimetype, etag = page
+            response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            # browsers may keep the page but must check it is still current
+            response.cache_control.no_cache = True
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                self.not_modified += 1
+            return response
+        return cached_view
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {'pages': len(self._pages), 'hits': self.hits, 'misses': self.misses,
+                'not_modified': self.not_modified}
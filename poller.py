@@ -0,0 +1,84 @@
+# poller.py
+import os
+import threading
+import time
+
+from snapshot import EMPTY
+
+
+class Poller:
+    """Fetch the upstream on a fixed interval and publish a Snapshot.
+
+    Request handlers only read ``poller.snapshot``; the upstream is called
+    once per interval per process no matter how many visitors there are.
+    The thread is started lazily so it runs in each gunicorn worker rather
+    than in the master before forking. When ``is_writer`` is given, only
+    ticks where it returns True actually poll (one writer per host).
+    """
+
+    def __init__(self, fetch, interval=60, snapshot=None, on_publish=None, is_writer=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.snapshot = snapshot or EMPTY
+        self.on_publish = on_publish
+        self.is_writer = is_writer
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start the polling thread once per process (no-op if running)."""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='apaw-poller', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self):
+        """Fetch once and publish a new snapshot; keeps the old one on error."""
+        try:
+            readings = self.fetch()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = repr(e)
+            return False
+        self.snapshot = self.snapshot.next(readings)
+        self.polls += 1
+        self.last_error = None
+        if self.on_publish is not None:
+            try:
+                self.on_publish(self.snapshot)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = repr(e)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            if self.is_writer is None or self.is_writer():
+                self.poll_once()
+            elapsed = time.monotonic() - started
+            self._stop.wait(max(0, self.interval - elapsed))
+
+    def stats(self):
+        age = self.snapshot.age
+        return {
+            'interval': self.interval,
+            'polls': self.polls,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'version': self.snapshot.version,
+            'age': round(age, 1) if age is not None else None,
+        }
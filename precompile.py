@@ -0,0 +1,48 @@
+# precompile.py
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def bytecode_cache(directory):
+    """A Jinja bytecode cache in ``directory``, shared by every worker.
+
+    Compiled templates are stored keyed by template name and checked
+    against a checksum of the source, so an edited template is simply
+    compiled again.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def precompile(env):
+    """Load every template of ``env`` up front; returns {name: seconds}.
+
+    With a bytecode cache the first worker compiles each template once and
+    the rest (and every later boot) only unmarshal the cached code. A
+    template that fails to compile is reported as None and left to fail
+    on first render instead of at startup.
+    """
+    timings = {}
+    for name in env.list_templates():
+        start = time.perf_counter()
+        try:
+            env.get_template(name)
+        except Exception:
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def summary(timings):
+    """Status numbers for precompile() timings, in milliseconds."""
+    loaded = {name: t for name, t in timings.items() if t is not None}
+    slowest = sorted(loaded, key=loaded.get, reverse=True)[:5]
+    return {
+        'templates': len(loaded),
+        'failed': sorted(name for name, t in timings.items() if t is None),
+        'total_ms': round(sum(loaded.values()) * 1000, 2),
+        'slowest_ms': {name: round(loaded[name] * 1000, 2) for name in slowest},
+    }
@@ -0,0 +1,201 @@
+# readings.py
+import os
+from datetime import datetime, time, timedelta, timezone
+
+# Numeric fields and the range a sane sensor reading falls in
+NUMERIC_FIELDS = {
+    'Temperature': (-20.0, 60.0),
+    'Humidity': (0.0, 100.0),
+    'WindSpeed': (0.0, 100.0),
+    'WindDegree': (0.0, 360.0),
+    'WaterLevel': (-50.0, 50.0),
+    'HourlyRain': (0.0, 500.0),
+    'DailyRain': (0.0, 2000.0),
+}
+
+# Numeric fields that are whole numbers (shown without a decimal point)
+INTEGER_FIELDS = ('WindDegree',)
+
+DATETIME_FIELDS = ('DateTime', 'SensorTime')
+
+# Datetimes are kept naive in station-local time; timestamps the upstream
+# sends with an offset (or Z) are converted to it first. Philippine time
+# has no DST, so a fixed offset is enough.
+STATION_TZ = timezone(timedelta(hours=float(os.environ.get("APAW_STATION_UTC_OFFSET", 8))))
+
+_DATETIME_FORMATS = (
+    '%m/%d/%Y %I:%M:%S %p',
+    '%m/%d/%Y %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+)
+
+
+def parse_number(value, low=None, high=None):
+    """float(value) if it is a number within [low, high], else None."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if number != number:    # NaN
+        return None
+    if (low is not None and number < low) or (high is not None and number > high):
+        return None
+    return number
+
+
+def parse_datetime(value):
+    """A datetime from the formats the upstream has been seen to use, or None."""
+    if isinstance(value, datetime):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(STATION_TZ).replace(tzinfo=None)
+        return parsed
+    except ValueError:
+        pass
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_time(value):
+    """A time of day (e.g. a bare SensorTime of "14:05:00"), or None."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return time.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+# Every field a Reading stores in its own slot
+FIELDS = ('StationID', 'DateTime', 'SensorTime', 'Temperature', 'Humidity',
+          'WindSpeed', 'WindDirection', 'WindDegree', 'WaterLevel',
+          'HourlyRain', 'DailyRain')
+_FIELD_SET = frozenset(FIELDS)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(dt):
+    """Seconds since 1970-01-01 for a naive station-local datetime."""
+    return (dt - _EPOCH).total_seconds()
+
+
+def from_seconds(seconds):
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def heat_index(temperature, humidity):
+    """NWS heat index (°C) from air temperature (°C) and relative humidity (%).
+
+    Below about 27 °C the simple Steadman estimate is used, above it the
+    Rothfusz regression with the NWS low/high humidity adjustments.
+    """
+    t = temperature * 9 / 5 + 32
+    rh = humidity
+    hi = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    if (hi + t) / 2 >= 80:
+        hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+              - 0.00683783 * t * t - 0.05481717 * rh * rh + 0.00122874 * t * t * rh
+              + 0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+        if rh < 13 and 80 <= t <= 112:
+            hi -= (13 - rh) / 4 * ((17 - abs(t - 95)) / 17) ** 0.5
+        elif rh > 85 and 80 <= t <= 87:
+            hi += (rh - 85) / 10 * (87 - t) / 5
+    return (hi - 32) * 5 / 9
+
+
+class Reading:
+    """One parsed reading, kept in __slots__ rather than a per-reading dict.
+
+    Attribute access (``row.Temperature`` in templates) works directly, and
+    ``get``/``[]``/``keys`` keep dict-style call sites working. Upstream keys
+    we don't know about are kept in ``extra``.
+    """
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, extra=None, **values):
+        for name in FIELDS:
+            setattr(self, name, values.get(name))
+        self.extra = extra or None
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in _FIELD_SET or bool(self.extra and key in self.extra)
+
+    def keys(self):
+        return FIELDS + tuple(self.extra or ())
+
+    def as_dict(self, extra=True):
+        """Fields (and, unless ``extra`` is false, unknown upstream keys) by name."""
+        return {key: self[key] for key in (self.keys() if extra else FIELDS)}
+
+    @classmethod
+    def from_dict(cls, values):
+        """The inverse of as_dict(); fields missing from ``values`` are None."""
+        return cls({key: value for key, value in values.items() if key not in _FIELD_SET},
+                   **{name: values[name] for name in FIELDS if name in values})
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Reading(%s %s)' % (self.StationID, self.DateTime)
+
+
+def normalize(raw):
+    """Parse one upstream reading dict into a typed Reading.
+
+    Numeric fields become numbers (None when missing, malformed or out of
+    range): ints when whole, so "80" still shows as 80 in templates as in
+    live.js, else floats. DateTime/SensorTime become datetimes. A SensorTime carrying
+    only a time of day is placed on the DateTime's date. Other keys are kept
+    as they are.
+    """
+    reading = {name: raw.get(name) for name in FIELDS}
+    for name, (low, high) in NUMERIC_FIELDS.items():
+        number = parse_number(raw.get(name), low, high)
+        if number is not None and (name in INTEGER_FIELDS or number.is_integer()):
+            number = int(round(number))
+        reading[name] = number
+    reading['DateTime'] = parse_datetime(raw.get('DateTime'))
+    sensor_time = parse_datetime(raw.get('SensorTime'))
+    if sensor_time is None and reading['DateTime'] is not None:
+        time_of_day = parse_time(raw.get('SensorTime'))
+        if time_of_day is not None:
+            sensor_time = datetime.combine(reading['DateTime'].date(), time_of_day)
+    reading['SensorTime'] = sensor_time
+    extra = {key: value for key, value in raw.items() if key not in _FIELD_SET}
+    return Reading(extra, **reading)
+
+
+def normalize_all(rows):
+    """Normalize every reading that is a dict; anything else is dropped."""
+    return [normalize(r) for r in rows if isinstance(r, dict)]
@@ -0,0 +1,100 @@
+# rollups.py
+from array import array
+
+from readings import NUMERIC_FIELDS, to_seconds
+
+NAN = float('nan')
+
+PERIODS = {'hour': 3600, 'day': 86400}
+
+# The aggregate a chart should plot for each field. Rain gauges report
+# amounts, so they add up (DailyRain is already a running daily total, so
+# its max is the day's rain); everything else is averaged.
+AGGREGATES = {name: 'mean' for name in NUMERIC_FIELDS}
+AGGREGATES.update(HourlyRain='sum', DailyRain='max')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    StationID TEXT NOT NULL,
+    field TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (StationID, field, period, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    last_reading_id INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rollup_state VALUES (0, 0);
+"""
+
+# Folds readings newer than last_reading_id into the existing buckets
+_UPDATE = """
+INSERT INTO rollups (StationID, field, period, bucket, count, sum, min, max)
+SELECT StationID, '{field}', '{period}', CAST(DateTime / {seconds} AS INTEGER) * {seconds} AS b,
+       COUNT({field}), SUM({field}), MIN({field}), MAX({field})
+FROM readings
+WHERE id > ? AND {field} IS NOT NULL
+GROUP BY StationID, b
+ON CONFLICT (StationID, field, period, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+
+def update(conn):
+    """Add readings inserted since the last update to the hourly/daily buckets.
+
+    Runs inside the caller's transaction, so buckets always match the raw
+    rows; only new rows are scanned, never the whole table.
+    """
+    last_id, = conn.execute('SELECT last_reading_id FROM rollup_state').fetchone()
+    max_id, = conn.execute('SELECT COALESCE(MAX(id), 0) FROM readings').fetchone()
+    if max_id <= last_id:
+        return
+    for period, seconds in PERIODS.items():
+        for field in NUMERIC_FIELDS:
+            conn.execute(_UPDATE.format(field=field, period=period, seconds=seconds), (last_id,))
+    conn.execute('UPDATE rollup_state SET last_reading_id = ?', (max_id,))
+
+
+def query(conn, station, field, period, start=None, end=None):
+    """Buckets for one station/field/period, oldest first, as dicts."""
+    if field not in NUMERIC_FIELDS:
+        raise ValueError('unknown field %r' % field)
+    if period not in PERIODS:
+        raise ValueError('unknown period %r' % period)
+    sql = ('SELECT bucket, count, sum, min, max FROM rollups'
+           ' WHERE StationID = ? AND field = ? AND period = ?')
+    args = [station, field, period]
+    if start is not None:
+        sql += ' AND bucket >= ?'
+        args.append(to_seconds(start) // PERIODS[period] * PERIODS[period])
+    if end is not None:
+        sql += ' AND bucket <= ?'
+        args.append(to_seconds(end))
+    rows = conn.execute(sql + ' ORDER BY bucket', args).fetchall()
+    return [{'bucket': bucket, 'count': count, 'sum': total, 'min': low, 'max': high,
+             'mean': total / count}
+            for bucket, count, total, low, high in rows]
+
+
+def columns(conn, station, fields, period, start=None, end=None):
+    """(bucket times, {field: values}) plotting AGGREGATES[field] per bucket.
+
+    Same shape as ReadingStore.columns(), so charts over long ranges read
+    a few hundred buckets instead of every raw row. Buckets a field has no
+    values in are NaN.
+    """
+    buckets = {field: {row['bucket']: row[AGGREGATES[field]]
+                       for row in query(conn, station, field, period, start, end)}
+               for field in fields}
+    times = array('d', sorted(set().union(*buckets.values())))
+    return times, {field: array('d', (buckets[field].get(t, NAN) for t in times))
+                   for field in fields}
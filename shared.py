@@ -0,0 +1,122 @@
+# shared.py
+import mmap
+import os
+import struct
+import threading
+from dataclasses import replace
+
+try:
+    import fcntl
+except ImportError:     # not on Windows; every process polls for itself
+    fcntl = None
+
+from snapshot import Snapshot
+
+# version (u64), fetched_at (f64) of the snapshot currently on disk
+_HEADER = struct.Struct('<Qd')
+
+
+class SharedSnapshot:
+    """A snapshot shared by every worker process on the host.
+
+    One process at a time holds an exclusive ``flock`` on ``<path>.lock``
+    and is the only one that polls the upstream. It writes the snapshot to
+    ``path`` and then bumps a version counter in a small memory-mapped
+    ``<path>.meta`` file. Every other worker checks that counter on each
+    request (a plain memory read) and only re-reads the snapshot file when
+    it changed. If the writer dies the OS drops its lock and another worker
+    takes over on its next poll tick.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.meta_path = path + '.meta'
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._meta = None
+        self._pid = None
+        self._current = None
+        self.reloads = 0
+
+    def _reset_after_fork(self):
+        # Locks and maps inherited from a parent process are not ours
+        if self._pid != os.getpid():
+            self._lock_fd = None
+            self._meta = None
+            self._current = None
+            self._pid = os.getpid()
+
+    def _map_meta(self):
+        if self._meta is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.meta_path)), exist_ok=True)
+            fd = os.open(self.meta_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < _HEADER.size:
+                    os.ftruncate(fd, _HEADER.size)
+                self._meta = mmap.mmap(fd, _HEADER.size)
+            finally:
+                os.close(fd)
+        return self._meta
+
+    def is_writer(self):
+        """Try to become (or confirm we are) the single writer."""
+        with self._lock:
+            self._reset_after_fork()
+            if fcntl is None:
+                return True
+            if self._lock_fd is not None:
+                return True
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._lock_fd = fd
+            return True
+
+    def publish(self, snapshot):
+        """Writer side: store ``snapshot`` and announce it to the readers."""
+        with self._lock:
+            self._reset_after_fork()
+            if self._current is None or self._current.version != snapshot.version:
+                snapshot.save(self.path)
+            _HEADER.pack_into(self._map_meta(), 0, snapshot.version, snapshot.fetched_at or 0.0)
+            self._current = snapshot
+
+    def load(self):
+        """The snapshot on disk, or None."""
+        return Snapshot.load(self.path)
+
+    def read(self, fallback):
+        """Reader side: the newest shared snapshot, else ``fallback``."""
+        with self._lock:
+            self._reset_after_fork()
+            try:
+                version, fetched_at = _HEADER.unpack_from(self._map_meta(), 0)
+            except (OSError, ValueError):
+                return fallback
+            current = self._current or fallback
+            if version == 0:
+                return current
+            if version != current.version:
+                loaded = Snapshot.load(self.path)
+                if loaded is None:
+                    return current
+                self.reloads += 1
+                current = loaded
+            if fetched_at > (current.fetched_at or 0):
+                # same readings, confirmed fresh by a later poll
+                current = replace(current, fetched_at=fetched_at)
+            self._current = current
+            return current
+
+    def stats(self):
+        meta = self._meta
+        return {
+            'writer': self._lock_fd is not None or fcntl is None,
+            'version': _HEADER.unpack_from(meta, 0)[0] if meta is not None else None,
+            'reloads': self.reloads,
+        }
@@ -0,0 +1,98 @@
+# snapshot.py
+import os
+import pickle
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from readings import Reading
+from upstream import NOT_MODIFIED
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One immutable view of the upstream readings.
+
+    A new Snapshot is built for every successful poll and swapped in whole,
+    so request handlers never see a half-updated list. The per-station
+    index is built once here; treat it as read-only.
+    """
+    readings: tuple = ()
+    fetched_at: float = None    # time.time() of the upstream fetch
+    version: int = 0
+    # StationID -> tuple of that station's readings, newest DateTime first
+    by_station: dict = field(default_factory=dict, compare=False, repr=False)
+    # StationID -> newest reading
+    latest: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def build(cls, readings, version=0, fetched_at=None):
+        readings = tuple(readings)
+        grouped = {}
+        for r in readings:
+            grouped.setdefault(r.get('StationID'), []).append(r)
+        by_station = {station: tuple(sorted(rows, key=_reading_time, reverse=True))
+                      for station, rows in grouped.items()}
+        latest = {station: rows[0] for station, rows in by_station.items()}
+        return cls(readings, fetched_at or time.time(), version, by_station, latest)
+
+    def next(self, readings):
+        """The snapshot that follows this one after a fetch.
+
+        When the upstream reported NOT_MODIFIED the readings (and version)
+        are kept and only the fetch time moves forward.
+        """
+        if readings is NOT_MODIFIED:
+            return replace(self, fetched_at=time.time())
+        return Snapshot.build(readings, version=self.version + 1)
+
+    def save(self, path):
+        """Write the snapshot to ``path`` atomically (temp file + rename).
+
+        Readings are stored as plain dicts (Reading.as_dict()), so a file
+        written before a change to the Reading fields still loads; pickle
+        keeps the parsed datetimes and numbers, so loading it does not
+        repeat the normalization done at ingest.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'version': self.version,
+                             'fetched_at': self.fetched_at,
+                             'readings': [r.as_dict() for r in self.readings]},
+                            f, pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by save(), or None if missing/corrupt."""
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            readings = [Reading.from_dict(r) for r in data['readings']]
+            return cls.build(readings, data['version'], data['fetched_at'])
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ValueError, KeyError, TypeError):
+            return None
+
+    @property
+    def age(self):
+        """Seconds since the upstream fetch, or None for the empty snapshot."""
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+
+
+def _reading_time(reading):
+    return reading.get('DateTime') or datetime.min
+
+
+EMPTY = Snapshot()
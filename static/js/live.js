@@ -0,0 +1,53 @@
+/*---------------------------------------------
+// Live readings: listens to /api/stream (Server-Sent Events) and updates
+// the cards of the station shown in [data-live-station] in place, so the
+// page never has to poll or reload.
+--------------------------------------------*/
+(function (window, document, undefined) {
+  "use strict";
+
+  function format(value) {
+    return value === null || value === undefined ? "—" : String(value);
+  }
+
+  function update(root, reading) {
+    root.querySelectorAll("[data-field]").forEach(function (el) {
+      var field = el.getAttribute("data-field");
+      if (field in reading) {
+        el.textContent = format(reading[field]);
+      }
+    });
+  }
+
+  function connect() {
+    var root = document.querySelector("[data-live-station]");
+    if (!root || !window.EventSource) {
+      return;
+    }
+    var station = root.getAttribute("data-live-station");
+    var url = "/api/stream" + (station ? "?station=" + encodeURIComponent(station) : "");
+    var source = new EventSource(url);
+
+    source.addEventListener("reading", function (e) {
+      var reading = JSON.parse(e.data);
+      if (!station) {
+        // no reading was rendered yet; follow the first station that reports
+        station = reading.StationID;
+        root.setAttribute("data-live-station", station);
+      }
+      if (reading.StationID === station) {
+        update(root, reading);
+      }
+    });
+
+    source.addEventListener("error", function () {
+      // EventSource gives up on a non-200 answer (503 when the server has
+      // too many streams open); try again later instead of never
+      if (source.readyState === EventSource.CLOSED) {
+        window.setTimeout(connect, 30000);
+      }
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", connect);
+})(window, document);
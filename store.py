@@ -0,0 +1,203 @@
+# store.py
+import os
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import rollups
+from readings import FIELDS, INTEGER_FIELDS, NUMERIC_FIELDS, Reading, from_seconds, to_seconds
+
+# DateTime/SensorTime are stored as seconds (readings.to_seconds) so range
+# queries compare plain numbers
+_TIME_FIELDS = ('DateTime', 'SensorTime')
+
+NAN = float('nan')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY,
+    StationID TEXT NOT NULL,
+    DateTime REAL NOT NULL,
+    SensorTime REAL,
+    Temperature REAL,
+    Humidity REAL,
+    WindSpeed REAL,
+    WindDirection TEXT,
+    WindDegree REAL,
+    WaterLevel REAL,
+    HourlyRain REAL,
+    DailyRain REAL,
+    UNIQUE (StationID, DateTime)
+);
+"""
+
+
+class ReadingStore:
+    """Every ingested reading, kept in a local SQLite database.
+
+    Rows are unique on (StationID, DateTime), which is also the index range
+    queries use, so re-ingesting an overlapping upstream window only adds
+    the readings we haven't seen. The database runs in WAL mode so readers
+    in other workers are not blocked by the single writer. Hourly and daily
+    rollups are updated in the same transaction as the inserts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._conns = {}
+        self._pid = None
+        self.version = 0    # last snapshot version ingested
+        self.inserted = 0
+        self._created = False
+        try:
+            self._create()
+        except (OSError, sqlite3.Error):
+            pass    # retried by the first add()
+
+    def _create(self):
+        """Create the database in WAL mode and its tables, once per process."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA + rollups.SCHEMA)
+        finally:
+            conn.close()
+        self._created = True
+
+    def connect(self, write=False):
+        """This process's read-only (or writing) connection, re-opened after fork.
+
+        One connection per process, shared by its threads: under gevent a
+        thread local is per greenlet, so per-thread connections would mean
+        one new connection per request. Reads go through reading(), which
+        holds the connection for one query at a time; the writer is
+        serialized by ingest().
+        """
+        if self._pid != os.getpid():
+            self._conns = {}
+            self._pid = os.getpid()
+        conn = self._conns.get(write)
+        if conn is None:
+            if write:
+                conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                conn.execute('PRAGMA synchronous=NORMAL')
+            else:
+                conn = sqlite3.connect('file:%s?mode=ro' % quote(os.path.abspath(self.path)),
+                                       uri=True, timeout=10, check_same_thread=False)
+            conn = self._conns.setdefault(write, conn)
+        return conn
+
+    @contextmanager
+    def reading(self):
+        """The read connection, held by this thread for the ``with`` block."""
+        with self._read_lock:
+            yield self.connect()
+
+    def add(self, readings):
+        """Insert readings in one transaction; returns how many were new."""
+        rows = [_to_row(r) for r in readings
+                if r.DateTime is not None and r.StationID is not None]
+        if not rows:
+            return 0
+        if not self._created:
+            self._create()
+        conn = self.connect(write=True)
+        placeholders = ', '.join('?' * len(FIELDS))
+        with conn:
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO readings (%s) VALUES (%s)'
+                             % (', '.join(FIELDS), placeholders), rows)
+            added = conn.total_changes - before
+            if added:
+                rollups.update(conn)
+        self.inserted += added
+        return added
+
+    def ingest(self, snapshot):
+        """Store the readings of a new snapshot version (once per version)."""
+        with self._lock:
+            if snapshot.version == self.version:
+                return 0
+            added = self.add(snapshot.readings)
+            self.version = snapshot.version
+            return added
+
+    def since(self, cursor, limit):
+        """Up to ``limit`` (id, Reading) pairs inserted after row id ``cursor``.
+
+        Row ids only grow, so the id of the last reading a client saw is a
+        cursor for everything ingested after it; the primary key makes this
+        a range scan over just the new rows.
+        """
+        with self.reading() as conn:
+            rows = conn.execute(
+                'SELECT id, %s FROM readings WHERE id > ? ORDER BY id LIMIT ?'
+                % ', '.join(FIELDS), (cursor, limit)).fetchall()
+        return [(row[0], _to_reading(row[1:])) for row in rows]
+
+    def last_id(self):
+        """Id of the newest stored reading (0 when empty)."""
+        with self.reading() as conn:
+            last, = conn.execute('SELECT MAX(id) FROM readings').fetchone()
+        return last or 0
+
+    def columns(self, station, fields, start=None, end=None):
+        """(times, {field: values}) for numeric fields, oldest first.
+
+        Same shape as History.columns(); missing values are NaN.
+        """
+        for field in fields:
+            if field not in NUMERIC_FIELDS:
+                raise ValueError('unknown field %r' % field)
+        sql, args = self._range('SELECT DateTime, %s FROM readings' % ', '.join(fields),
+                                station, start, end)
+        with self.reading() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        times = array('d', (row[0] for row in rows))
+        columns = {field: array('d', (NAN if row[i] is None else row[i] for row in rows))
+                   for i, field in enumerate(fields, 1)}
+        return times, columns
+
+    def rollup_columns(self, station, fields, period, start=None, end=None):
+        """Like columns(), from hourly/daily buckets; see rollups.columns()."""
+        with self.reading() as conn:
+            return rollups.columns(conn, station, fields, period, start, end)
+
+    @staticmethod
+    def _range(select, station, start, end):
+        sql = select + ' WHERE StationID = ?'
+        args = [station]
+        if start is not None:
+            sql += ' AND DateTime >= ?'
+            args.append(to_seconds(start))
+        if end is not None:
+            sql += ' AND DateTime <= ?'
+            args.append(to_seconds(end))
+        return sql + ' ORDER BY DateTime', args
+
+    def stats(self):
+        with self.reading() as conn:
+            count, = conn.execute('SELECT COUNT(*) FROM readings').fetchone()
+        return {'version': self.version, 'inserted': self.inserted, 'rows': count}
+
+
+def _to_row(reading):
+    return [to_seconds(reading[name]) if name in _TIME_FIELDS and reading[name] else reading[name]
+            for name in FIELDS]
+
+
+def _to_reading(row):
+    values = dict(zip(FIELDS, row))
+    for name in _TIME_FIELDS:
+        if values[name] is not None:
+            values[name] = from_seconds(values[name])
+    # REAL columns hand back 80.0; whole numbers are ints, as normalize() makes them
+    for name in NUMERIC_FIELDS:
+        if values[name] is not None and (name in INTEGER_FIELDS or values[name].is_integer()):
+            values[name] = int(values[name])
+    return Reading(**values)
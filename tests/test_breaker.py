@@ -0,0 +1,93 @@
+# tests/test_breaker.py
+import pytest
+
+import breaker
+from breaker import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker, 'time', clock)
+    return clock
+
+
+def fail():
+    raise OSError('down')
+
+
+def _trip(cb):
+    for _ in range(cb.failure_threshold):
+        with pytest.raises(OSError):
+            cb.call(fail)
+
+
+def test_opens_after_threshold_and_short_circuits(clock):
+    cb = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            cb.call(fail)
+    assert cb.state == cb.CLOSED
+    with pytest.raises(OSError):
+        cb.call(fail)
+    assert cb.state == cb.OPEN and cb.trips == 1
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: 'never called')
+    assert cb.short_circuited == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    cb = CircuitBreaker(failure_threshold=2)
+    with pytest.raises(OSError):
+        cb.call(fail)
+    assert cb.call(lambda: 'ok') == 'ok'
+    with pytest.raises(OSError):
+        cb.call(fail)
+    assert cb.state == cb.CLOSED
+
+
+def test_half_open_trial_success_closes(clock):
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    _trip(cb)
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: 'ok')
+    clock.now += 1
+    assert cb.call(lambda: 'ok') == 'ok'
+    assert cb.state == cb.CLOSED and cb.failures == 0
+
+
+def test_half_open_trial_failure_reopens(clock):
+    cb = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    _trip(cb)
+    clock.now += 60
+    with pytest.raises(OSError):
+        cb.call(fail)
+    assert cb.state == cb.OPEN and cb.trips == 2
+    # the cool-down starts over from the failed trial
+    clock.now += 30
+    with pytest.raises(CircuitOpenError):
+        cb.call(lambda: 'ok')
+
+
+def test_only_one_trial_while_half_open(clock):
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    _trip(cb)
+    clock.now += 60
+
+    def trial():
+        # a second caller arriving while the trial is in flight
+        with pytest.raises(CircuitOpenError):
+            cb.call(lambda: 'ok')
+        return 'trial'
+
+    assert cb.call(trial) == 'trial'
+    assert cb.state == cb.CLOSED
@@ -0,0 +1,36 @@
+# tests/test_downsample.py
+import pytest
+
+from downsample import lttb, lttb_indices
+
+
+@pytest.mark.parametrize('n, threshold', [(0, 10), (1, 10), (2, 10), (5, 5), (5, 6),
+                                          (10, 2), (10, 0), (10, -1)])
+def test_short_series_or_small_threshold_are_kept_whole(n, threshold):
+    xs = list(range(n))
+    assert lttb_indices(xs, [x * x for x in xs], threshold) == list(range(n))
+
+
+@pytest.mark.parametrize('n', [4, 5, 10, 101, 1000])
+@pytest.mark.parametrize('threshold', [3, 4, 7, 50])
+def test_at_most_threshold_points_with_both_ends(n, threshold):
+    xs = list(range(n))
+    ys = [(x * 7919) % 13 for x in xs]
+    indices = lttb_indices(xs, ys, threshold)
+    assert len(indices) == min(n, threshold)
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert indices == sorted(set(indices))
+
+
+def test_keeps_the_peak():
+    xs = list(range(100))
+    ys = [0.0] * 100
+    ys[37] = 50.0
+    assert 37 in lttb_indices(xs, ys, 10)
+
+
+def test_lttb_returns_points():
+    xs, ys = [0, 1, 2, 3, 4], [1, 5, 2, 8, 3]
+    assert lttb(xs, ys, 3)[0] == (0, 1)
+    assert lttb(xs, ys, 3)[-1] == (4, 3)
+    assert lttb(xs, ys, 10) == list(zip(xs, ys))
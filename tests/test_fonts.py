@@ -0,0 +1,36 @@
+# tests/test_fonts.py
+from fonts import _content, _statements
+
+
+def test_rules_at_blocks_and_comments_in_order():
+    css = ('/* v6 */.fa{display:inline-block}@media (min-width:1px){.a{b:c}.d{e:f}}'
+           '@charset "utf-8";.x{y:z}')
+    assert _statements(css) == ['/* v6 */', '.fa{display:inline-block}',
+                                '@media (min-width:1px){.a{b:c}.d{e:f}}',
+                                '@charset "utf-8";', '.x{y:z}']
+
+
+def test_braces_and_semicolons_inside_strings():
+    css = '.a:before{content:"{"}.b:before{content:";}"}.c{d:e}'
+    assert _statements(css) == ['.a:before{content:"{"}', '.b:before{content:";}"}', '.c{d:e}']
+
+
+def test_escaped_quotes_inside_strings():
+    css = r'.a:before{content:"\"}"}' + r".b:before{content:'\'{'}.c{}"
+    assert _statements(css) == [r'.a:before{content:"\"}"}', r".b:before{content:'\'{'}",
+                                '.c{}']
+
+
+def test_comment_inside_a_block_stays_in_it():
+    assert _statements('.a{/* } */b:c}') == ['.a{/* } */b:c}']
+
+
+def test_whitespace_only_is_dropped():
+    assert _statements('  \n.a{b:c}\n\n') == ['.a{b:c}']
+
+
+def test_content_codepoints():
+    assert _content('{content:"\\f0c9"}') == {0xf0c9}
+    assert _content('{content:"\\2b"}') == {0x2b}
+    assert _content('{content:"\\+"}') == {ord('+')}
+    assert _content('{content:"\\f0c9\\f0ca"}') == {0xf0c9, 0xf0ca}
@@ -0,0 +1,75 @@
+# tests/test_rollups.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import rollups
+from readings import normalize, to_seconds
+from store import ReadingStore
+
+START = datetime(2026, 1, 1)
+
+
+def _readings(minutes, **values):
+    return [normalize(dict({'StationID': 'S1', 'DateTime': str(START + timedelta(minutes=m))},
+                           **values)) for m in minutes]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReadingStore(str(tmp_path / 'readings.sqlite3'))
+
+
+def _hour(store, field, hour=0):
+    with store.reading() as conn:
+        rows = rollups.query(conn, 'S1', field, 'hour')
+    return {row['bucket']: row for row in rows}[to_seconds(START) + hour * 3600]
+
+
+def test_second_ingest_folds_into_existing_buckets(store):
+    assert store.add(_readings(range(0, 30, 10), Temperature='20', HourlyRain='1')) == 3
+    first = _hour(store, 'Temperature')
+    assert (first['count'], first['sum'], first['min'], first['max']) == (3, 60, 20, 20)
+
+    # half overlapping: the repeated minutes are ignored, the rest are added
+    store.add(_readings(range(20, 80, 10), Temperature='26', HourlyRain='2'))
+    hour0, hour1 = _hour(store, 'Temperature'), _hour(store, 'Temperature', 1)
+    assert (hour0['count'], hour0['sum'], hour0['min'], hour0['max']) == (6, 138, 20, 26)
+    assert (hour1['count'], hour1['sum']) == (2, 52)
+    assert _hour(store, 'HourlyRain')['sum'] == 9
+
+
+def test_update_matches_a_full_rebuild(store):
+    store.add(_readings(range(0, 600, 7), Temperature='21.5'))
+    store.add(_readings(range(600, 1500, 11), Temperature='23'))
+    with store.reading() as conn:
+        incremental = rollups.query(conn, 'S1', 'Temperature', 'day')
+    conn = store.connect(write=True)
+    with conn:
+        conn.execute('DELETE FROM rollups')
+        conn.execute('UPDATE rollup_state SET last_reading_id = 0')
+        rollups.update(conn)
+    with store.reading() as conn:
+        assert rollups.query(conn, 'S1', 'Temperature', 'day') == incremental
+
+
+def test_missing_values_are_skipped(store):
+    store.add(_readings([0], Temperature='20') + _readings([5]))
+    assert _hour(store, 'Temperature')['count'] == 1
+
+
+def test_columns_fill_missing_buckets_with_nan(store):
+    store.add(_readings([0, 60], Temperature='20') + _readings([120], HourlyRain='4'))
+    times, columns = store.rollup_columns('S1', ['Temperature', 'HourlyRain'], 'hour')
+    assert len(times) == 3
+    assert list(columns['Temperature'][:2]) == [20, 20]
+    assert columns['Temperature'][2] != columns['Temperature'][2]
+    assert columns['HourlyRain'][2] == 4
+
+
+def test_unknown_field_or_period(store):
+    with store.reading() as conn:
+        with pytest.raises(ValueError):
+            rollups.query(conn, 'S1', 'Pressure', 'hour')
+        with pytest.raises(ValueError):
+            rollups.query(conn, 'S1', 'Temperature', 'week')
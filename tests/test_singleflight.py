@@ -0,0 +1,61 @@
+# tests/test_singleflight.py
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _concurrently(n, flight, fn):
+    results, errors = [], []
+    started = threading.Barrier(n)
+
+    def call():
+        started.wait()
+        try:
+            results.append(flight.do('key', fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = _concurrently(5, flight, slow)
+    assert results == ['value'] * 5 and not errors
+    assert len(calls) == 1
+    assert flight.stats() == {'calls': 1, 'coalesced': 4}
+
+
+def test_waiters_get_the_same_exception():
+    flight, release = SingleFlight(), threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise OSError('down')
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = _concurrently(4, flight, failing)
+    assert not results and len(errors) == 4
+    assert all(e is errors[0] for e in errors)
+
+
+def test_next_call_after_completion_runs_again():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(ZeroDivisionError):
+        flight.do('key', lambda: 1 / 0)
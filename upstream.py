@@ -0,0 +1,170 @@
+# upstream.py
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds; connect fails fast, read allows slow API
+CONNECT_TIMEOUT = float(os.environ.get("APAW_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.environ.get("APAW_READ_TIMEOUT", 8))
+
+# Connections kept alive per host; should cover the worker's thread count
+POOL_SIZE = int(os.environ.get("APAW_POOL_SIZE", 10))
+
+# Retries on connection errors and 502/503/504, with jittered backoff;
+# read timeouts are not retried
+RETRIES = int(os.environ.get("APAW_RETRIES", 2))
+BACKOFF = float(os.environ.get("APAW_BACKOFF", 0.3))
+
+
+class _NotModified:
+    def __repr__(self):
+        return 'NOT_MODIFIED'
+
+
+# Returned by get_json(conditional=True) when the payload hasn't changed
+NOT_MODIFIED = _NotModified()
+
+# What we remember about the last full response for a URL
+Validators = namedtuple('Validators', 'etag last_modified digest size')
+
+
+class JitteredRetry(Retry):
+    """Retry with "full jitter" backoff so workers don't retry in lockstep."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class UpstreamClient:
+    """A keep-alive ``requests.Session`` shared by everything in a process.
+
+    Reusing the session's connection pool means the TCP and TLS handshake to
+    the upstream happens once per worker instead of once per request. The
+    session is rebuilt after a fork so workers never share sockets.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, retries=RETRIES, backoff=BACKOFF,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._validators = {}
+        self._started = time.monotonic()
+        self.bytes_received = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.bytes_saved = 0
+        self.parses_saved = 0
+
+    def _build_session(self):
+        retry = JitteredRetry(
+            total=self.retries,
+            connect=self.retries,
+            # a read timeout already waited READ_TIMEOUT; don't wait it again
+            read=0,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size,
+                              max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept': 'application/json', 'Connection': 'keep-alive'})
+        return session
+
+    @property
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def get_json(self, url, conditional=False, **kwargs):
+        """GET and decode JSON.
+
+        With ``conditional=True`` the ETag/Last-Modified of the previous
+        response are sent back, and NOT_MODIFIED is returned instead of the
+        payload on a 304 or when the body hashes the same as last time, so
+        the caller can skip decoding and everything downstream of it.
+        """
+        if not conditional:
+            r = self.get(url, **kwargs)
+            r.raise_for_status()
+            self.bytes_received += len(r.content)
+            return r.json()
+
+        key = requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+        previous = self._validators.get(key)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if previous is not None:
+            if previous.etag:
+                headers['If-None-Match'] = previous.etag
+            if previous.last_modified:
+                headers['If-Modified-Since'] = previous.last_modified
+
+        r = self.get(url, headers=headers, **kwargs)
+        if r.status_code == 304 and previous is not None:
+            self.not_modified += 1
+            self.bytes_saved += previous.size
+            self.parses_saved += 1
+            return NOT_MODIFIED
+        r.raise_for_status()
+
+        body = r.content
+        self.bytes_received += len(body)
+        digest = hashlib.sha1(body).hexdigest()
+        validators = Validators(r.headers.get('ETag'), r.headers.get('Last-Modified'),
+                                digest, len(body))
+        if previous is not None and previous.digest == digest:
+            self._validators[key] = validators
+            self.unchanged += 1
+            self.parses_saved += 1
+            return NOT_MODIFIED
+        try:
+            payload = r.json()
+        except ValueError:
+            # not JSON (e.g. a maintenance page): remember nothing, so the
+            # same body fails again instead of passing as NOT_MODIFIED
+            self._validators.pop(key, None)
+            raise
+        # only bodies that decoded may vouch for later identical responses
+        self._validators[key] = validators
+        return payload
+
+    def stats(self):
+        hours = max(time.monotonic() - self._started, 60) / 3600
+        return {
+            'bytes_received': self.bytes_received,
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'bytes_saved': self.bytes_saved,
+            'parses_saved': self.parses_saved,
+            'bytes_saved_per_hour': round(self.bytes_saved / hours),
+            'parses_saved_per_hour': round(self.parses_saved / hours, 1),
+        }
+
+
+client = UpstreamClient()